@@ -2,22 +2,24 @@
 
 import asyncio
 from datetime import datetime, timedelta
+import hashlib
 import logging
+import re
+import time
+from types import SimpleNamespace
 from urllib.parse import urlparse
 
-from dateutil.rrule import rruleset, rrulestr
-from dateutil.tz import gettz, tzutc
-import icalendar
 import voluptuous as vol
 
 from homeassistant.components.calendar import CalendarEvent
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_NAME, CONF_URL, CONF_VERIFY_SSL
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.util import Throttle, dt as dt_util
 
-from .const import CONF_DAYS, CONF_MAX_EVENTS, DOMAIN
+from .const import CONF_DAYS, CONF_MAX_EVENTS, CONF_VERIFY_WINDOW, DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,6 +33,16 @@ PLATFORMS = ["sensor"]
 
 MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=120)
 
+DATA_PARSER = f"{DOMAIN}_parser"
+
+# DTSTAMP (with any folded continuation lines), which many providers regenerate on every request
+DTSTAMP_LINES = re.compile(
+    r"^DTSTAMP[:;][^\n]*\n?(?:[ \t][^\n]*\n?)*", re.IGNORECASE | re.MULTILINE
+)
+
+# The only properties of an event that end up in the expanded events
+EVENT_PROPERTIES = ("SUMMARY", "LOCATION", "DESCRIPTION")
+
 
 def setup(hass: HomeAssistant, config):
     """Set up this integration with config flow."""
@@ -39,6 +51,7 @@ def setup(hass: HomeAssistant, config):
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up ical from a config entry."""
+    start = time.monotonic()
     config = entry.data
     _LOGGER.debug(
         "Running init async_setup_entry for calendar %s", config.get(CONF_NAME)
@@ -47,13 +60,37 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     # hass.data[DOMAIN][entry.entry_id] = MyApi(...)
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = {}
-    hass.data[DOMAIN][config.get(CONF_NAME)] = ICalEvents(hass=hass, config=config)
+    ical_events = ICalEvents(hass=hass, config=config)
+    ical_events.verify_window = entry.options.get(CONF_VERIFY_WINDOW, False)
+    hass.data[DOMAIN][config.get(CONF_NAME)] = ical_events
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    # One refresh per calendar drives all of its sensors, instead of every sensor polling
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass, ical_events.async_refresh, MIN_TIME_BETWEEN_UPDATES
+        )
+    )
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+    ical_events.startup_timings["setup"] = time.monotonic() - start
+
+    # Fetch the calendar in the background, so entries don't wait on each other's feeds
+    entry.async_create_background_task(
+        hass,
+        ical_events.async_first_refresh(),
+        f"{DOMAIN} first refresh {config.get(CONF_NAME)}",
+    )
+
     return True
 
 
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry):
+    """Apply changed options to a running calendar."""
+    ical_events = hass.data[DOMAIN][entry.data.get(CONF_NAME)]
+    ical_events.verify_window = entry.options.get(CONF_VERIFY_WINDOW, False)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
     config = entry.data
@@ -72,6 +109,36 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     return unload_ok
 
 
+async def async_get_parser(hass: HomeAssistant):
+    """Return the parser dependencies, importing them once for all entries."""
+    if DATA_PARSER not in hass.data:
+        # Importing icalendar and dateutil is slow, so it's done in the executor
+        hass.data[DATA_PARSER] = hass.async_add_executor_job(_load_parser)
+    parser = hass.data[DATA_PARSER]
+    try:
+        return await parser
+    except Exception:
+        # Don't keep a failed import, so the next refresh tries again
+        if hass.data.get(DATA_PARSER) is parser:
+            hass.data.pop(DATA_PARSER)
+        raise
+
+
+def _load_parser():
+    """Import the parser dependencies."""
+    from dateutil.rrule import rruleset, rrulestr
+    from dateutil.tz import gettz, tzutc
+    import icalendar
+
+    return SimpleNamespace(
+        icalendar=icalendar,
+        rruleset=rruleset,
+        rrulestr=rrulestr,
+        gettz=gettz,
+        tzutc=tzutc,
+    )
+
+
 class ICalEvents:
     """Get a list of events."""
 
@@ -83,9 +150,57 @@ class ICalEvents:
         self.max_events = config.get(CONF_MAX_EVENTS)
         self.days = config.get(CONF_DAYS)
         self.verify_ssl = config.get(CONF_VERIFY_SSL)
+        self.verify_window = False
         self.calendar = []
         self.event = None
         self.all_day = False
+        self._listeners = []
+        self._update_lock = asyncio.Lock()
+        self._parser = None
+        self.startup_timings = {}
+        self.refresh_timings = {}
+        # Expanded occurrences of the last parsed calendar, kept as a sliding window
+        self._window_digest = None
+        self._window = None
+        self._window_entries = []
+        self._etag = None
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Listen for calendar refreshes, return a callback that removes the listener."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    async def async_refresh(self, now=None):
+        """Refresh the calendar and notify every listener once, return False on failure."""
+        try:
+            await self.update(no_throttle=True)
+        except Exception as e:
+            _LOGGER.error("Unable to fetch iCal for calendar %s: %s", self.name, str(e))
+            return False
+        for update_callback in list(self._listeners):
+            update_callback()
+        return True
+
+    async def async_first_refresh(self):
+        """Load the parser, run the first refresh and record how long the steps took."""
+        start = time.monotonic()
+        try:
+            self._parser = await async_get_parser(self.hass)
+        except Exception as e:
+            # The refresh will try to load it again and log the failure
+            _LOGGER.debug("Unable to load the iCal parser: %s", str(e))
+        self.startup_timings["parser_load"] = time.monotonic() - start
+
+        start = time.monotonic()
+        await self.async_refresh()
+        self.startup_timings.update(self.refresh_timings)
+        self.startup_timings["first_refresh"] = time.monotonic() - start
 
     async def async_get_events(self, hass: HomeAssistant, start_date, end_date):
         """Get list of upcoming events."""
@@ -120,7 +235,19 @@ class ICalEvents:
     @Throttle(MIN_TIME_BETWEEN_UPDATES)
     async def update(self):
         """Update list of upcoming events."""
+        # The timer and update_entity may refresh at the same time, and parsing
+        # keeps state on the object between awaits, so refreshes must not interleave
+        async with self._update_lock:
+            await self._async_update()
+
+    async def _async_update(self):
+        """Fetch and parse the calendar."""
         _LOGGER.debug("Running ICalEvents update for calendar %s", self.name)
+        if self._parser is None:
+            self._parser = await async_get_parser(self.hass)
+
+        start = time.monotonic()
+        not_modified = False
         parts = urlparse(self.url)
         if parts.scheme == "file":
             with open(parts.path) as f:
@@ -130,18 +257,67 @@ class ICalEvents:
                 # There is a potential issue here if the real URL is http, not https
                 self.url = parts.geturl().replace("webcal", "https", 1)
             session = async_get_clientsession(self.hass, verify_ssl=self.verify_ssl)
-            async with session.get(self.url) as response:
-                text = await response.text()
+            headers = {}
+            # Only ask for changes when an unchanged feed can just slide the window
+            if self._etag and self._window is not None and not self.verify_window:
+                headers["If-None-Match"] = self._etag
+            async with session.get(self.url, headers=headers) as response:
+                if response.status == 304:
+                    not_modified = True
+                    text = None
+                else:
+                    text = await response.text()
+                    self._etag = response.headers.get("ETag")
+        self.refresh_timings["fetch"] = time.monotonic() - start
+
+        start = time.monotonic()
+        if not_modified:
+            _LOGGER.debug("Feed of calendar %s not modified", self.name)
+            start_of_events = dt_util.start_of_local_day()
+            calendar = self._ical_slide_window(
+                start_of_events, start_of_events + timedelta(days=self.days)
+            )
+            if calendar is None:
+                # Keep the events for now and fetch the whole feed next time
+                self._etag = None
+            else:
+                self.calendar = calendar
         if text is not None:
             # Some calendars are for some reason filled with NULL-bytes.
             # They break the parsing, so we get rid of them
-            event_list = icalendar.Calendar.from_ical(text.replace("\x00", ""))
+            text = text.replace("\x00", "")
             start_of_events = dt_util.start_of_local_day()
-            end_of_events = dt_util.start_of_local_day() + timedelta(days=self.days)
+            end_of_events = start_of_events + timedelta(days=self.days)
+
+            # The expanded events don't depend on DTSTAMP, so ignore it when comparing feeds
+            window_digest = hashlib.sha256(
+                DTSTAMP_LINES.sub("", text).encode()
+            ).digest()
+            calendar = None
+            if window_digest == self._window_digest:
+                # Same feed as last time, so only move the window to the new day
+                calendar = self._ical_slide_window(start_of_events, end_of_events)
+            elif self._window_digest is not None:
+                _LOGGER.debug(
+                    "Feed of calendar %s changed, not sliding the window", self.name
+                )
 
-            self.calendar = await self._ical_parser(
-                event_list, start_of_events, end_of_events
-            )
+            if calendar is None or self.verify_window:
+                rebuilt = await self._ical_parser(
+                    self._parser.icalendar.Calendar.from_ical(text),
+                    start_of_events,
+                    end_of_events,
+                )
+                if calendar is not None and calendar != rebuilt:
+                    _LOGGER.warning(
+                        "Sliding window for calendar %s differs from a full rebuild, using the rebuild",
+                        self.name,
+                    )
+                calendar = rebuilt
+                self._window_digest = window_digest
+
+            self.calendar = calendar
+        self.refresh_timings["parse"] = time.monotonic() - start
 
         if len(self.calendar) > 0:
             found_next_event = False
@@ -158,7 +334,12 @@ class ICalEvents:
     async def _ical_parser(self, calendar, from_date, to_date):
         """Return a sorted list of events from a icalendar object."""
 
-        events = []
+        # Every event that may fall inside the window, in calendar order, so the window
+        # can later be moved without parsing and expanding the calendar again.
+        entries = []
+        slidable = True
+        self._window = None
+        self._window_digest = None
 
         for event in calendar.walk("VEVENT"):
             # RRULEs turns out to be harder than initially thought.
@@ -169,8 +350,8 @@ class ICalEvents:
                 rrule = event["RRULE"]
                 # Since we dont get both the start and the end in a single object, we need to generate two lists,
                 # One of all the DTSTARTs and another list of all the DTENDs
-                start_rules = rruleset()
-                end_rules = rruleset()
+                start_rules = self._parser.rruleset()
+                end_rules = self._parser.rruleset()
 
                 if "UNTIL" in rrule:
                     try:
@@ -213,12 +394,15 @@ class ICalEvents:
                     dtend = await self._ical_date_fixer(
                         event["DTEND"].dt, dt_util.DEFAULT_TIME_ZONE
                     )
+                all_day = self.all_day
 
                 # So hopefully we now have a proper dtstart we can use to create the start-times according to the rrule
                 # _LOGGER.debug("RRulestr %s", rrule.to_ical().decode("utf-8"))
                 try:
                     start_rules.rrule(
-                        rrulestr(rrule.to_ical().decode("utf-8"), dtstart=dtstart)
+                        self._parser.rrulestr(
+                            rrule.to_ical().decode("utf-8"), dtstart=dtstart
+                        )
                     )
                 except Exception as e:
                     # If this fails, move on to the next event
@@ -235,7 +419,9 @@ class ICalEvents:
                 # ... And the same for end_rules
                 try:
                     end_rules.rrule(
-                        rrulestr(rrule.to_ical().decode("utf-8"), dtstart=dtend)
+                        self._parser.rrulestr(
+                            rrule.to_ical().decode("utf-8"), dtstart=dtend
+                        )
                     )
                 except Exception as e:
                     # If this fails, just use the start-rules
@@ -291,25 +477,21 @@ class ICalEvents:
                         str(dtend),
                         str(event["RRULE"]),
                     )
+                    # The failure might depend on the window, so it can't be slided later
+                    slidable = False
                     continue
 
-                # _LOGGER.debug("Starts: %s", str(starts))
-                # We might get RRULEs that does not fall within the limits above, lets just skip them
-                if len(starts) < 1:
-                    _LOGGER.debug("Event does not happen within our limits")
-                    continue
-
-                # It has to be a better way to do this...But at least it seems to work for now.
-                ends.reverse()
-                for start in starts:
-                    # Sometimes we dont get the same number of starts and ends...
-                    if len(ends) == 0:
-                        continue
-                    end = ends.pop()
-                    event_dict = self._ical_event_dict(start, end, from_date, event)
-
-                    if event_dict:
-                        events.append(event_dict)
+                # Keep the rules, even without starts, as a later window might include some
+                entries.append(
+                    {
+                        "event": self._ical_event_properties(event),
+                        "all_day": all_day,
+                        "start_rules": start_rules,
+                        "end_rules": end_rules,
+                        "starts": starts,
+                        "ends": ends,
+                    }
+                )
 
                 _LOGGER.debug("Done parsing RRULE")
 
@@ -363,13 +545,95 @@ class ICalEvents:
                     )
                 end = dtend
 
-                event_dict = self._ical_event_dict(start, end, from_date, event)
+                entries.append(
+                    {
+                        "event": self._ical_event_properties(event),
+                        "all_day": self.all_day,
+                        "start": start,
+                        "end": end,
+                    }
+                )
+
+        self._window_entries = entries
+        if slidable:
+            self._window = (from_date, to_date, dt_util.DEFAULT_TIME_ZONE)
+        return self._ical_window_events(entries, from_date)
+
+    @staticmethod
+    def _ical_event_properties(event):
+        """Return the properties of an event needed for the expanded events."""
+        return {key: event[key] for key in EVENT_PROPERTIES if key in event}
+
+    def _ical_slide_window(self, from_date, to_date):
+        """Move the expanded window forward, return None if it needs a full rebuild."""
+        if self._window is None:
+            return None
+        window_from, window_to, window_tz = self._window
+        if (
+            from_date < window_from
+            or to_date < window_to
+            or window_tz != dt_util.DEFAULT_TIME_ZONE
+        ):
+            return None
+
+        if (from_date, to_date) != (window_from, window_to):
+            _LOGGER.debug(
+                "Sliding window for calendar %s to %s - %s",
+                self.name,
+                from_date,
+                to_date,
+            )
+            after = from_date - timedelta(days=7)
+            for entry in self._window_entries:
+                if "start_rules" not in entry:
+                    continue
+                # Drop the occurrences that fell behind and expand only the newly exposed days
+                try:
+                    new_starts = entry["start_rules"].between(
+                        after=window_to, before=to_date, inc=True
+                    )
+                    new_ends = entry["end_rules"].between(
+                        after=window_to, before=to_date, inc=True
+                    )
+                except Exception as e:
+                    _LOGGER.debug(
+                        "Exception %s while sliding window: %s",
+                        str(e),
+                        str(entry["event"].get("SUMMARY")),
+                    )
+                    self._window = None
+                    return None
+                entry["starts"] = [
+                    start
+                    for start in entry["starts"] + new_starts
+                    if after < start < to_date
+                ]
+                entry["ends"] = [
+                    end for end in entry["ends"] + new_ends if after < end < to_date
+                ]
+            self._window = (from_date, to_date, window_tz)
+
+        return self._ical_window_events(self._window_entries, from_date)
+
+    def _ical_window_events(self, entries, from_date):
+        """Return a sorted list of events from the expanded entries."""
+        events = []
+        for entry in entries:
+            if "start_rules" in entry:
+                # Sometimes we dont get the same number of starts and ends...
+                pairs = zip(entry["starts"], entry["ends"])
+            else:
+                pairs = [(entry["start"], entry["end"])]
+            for start, end in pairs:
+                event_dict = self._ical_event_dict(
+                    start, end, from_date, entry["event"], entry["all_day"]
+                )
                 if event_dict:
                     events.append(event_dict)
 
         return sorted(events, key=lambda k: k["start"])
 
-    def _ical_event_dict(self, start, end, from_date, event):
+    def _ical_event_dict(self, start, end, from_date, event, all_day):
         """Ensure that events are within the start and end."""
 
         # Skip this event if it's in the past
@@ -398,7 +662,7 @@ class ICalEvents:
             "end": end.astimezone(dt_util.DEFAULT_TIME_ZONE),
             "location": event.get("LOCATION"),
             "description": event.get("DESCRIPTION"),
-            "all_day": self.all_day,
+            "all_day": all_day,
         }
         _LOGGER.debug("Event to add: %s", str(event_dict))
         return event_dict
@@ -438,13 +702,13 @@ class ICalEvents:
             # _LOGGER.debug("TZ-Naive indate: %s Adding TZ %s", str(indate), str(gettz(str(timezone))))
             # tz = pytz.timezone(str(timezone))
             # indate = tz.localize(indate)
-            return indate.replace(tzinfo=gettz(str(timezone)))
+            return indate.replace(tzinfo=self._parser.gettz(str(timezone)))
         # Rules dont play well with pytz
         # _LOGGER.debug("Tzinfo 1: %s", str(indate.tzinfo))
         if not str(indate.tzinfo).startswith("tzfile"):
             # _LOGGER.debug("Pytz indate: %s. replacing with tz %s", str(indate), str(gettz(str(indate.tzinfo))))
-            return indate.replace(tzinfo=gettz(str(indate.tzinfo)))
+            return indate.replace(tzinfo=self._parser.gettz(str(indate.tzinfo)))
         if str(indate.tzinfo).endswith("/UTC"):
-            return indate.replace(tzinfo=tzutc)
+            return indate.replace(tzinfo=self._parser.tzutc)
         # _LOGGER.debug("Tzinfo 2: %s", str(indate.tzinfo))
         return None
@@ -4,10 +4,17 @@ import logging
 import voluptuous as vol
 
 from homeassistant import config_entries, core, exceptions
+from homeassistant.core import callback
 from homeassistant.const import CONF_NAME, CONF_URL, CONF_VERIFY_SSL
 import homeassistant.helpers.config_validation as cv
 
-from .const import CONF_DAYS, CONF_MAX_EVENTS, DOMAIN, CONF_FILTER_KEYWORD
+from .const import (
+    CONF_DAYS,
+    CONF_MAX_EVENTS,
+    DOMAIN,
+    CONF_FILTER_KEYWORD,
+    CONF_VERIFY_WINDOW,
+)
 
 DEFAULT_MAX_EVENTS = 5
 DEFAULT_DAYS = 365
@@ -83,6 +90,39 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=DATA_SCHEMA, errors=errors
         )
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of an ical_custom calendar."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the debugging options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_VERIFY_WINDOW,
+                        default=self._config_entry.options.get(
+                            CONF_VERIFY_WINDOW, False
+                        ),
+                    ): cv.boolean,
+                }
+            ),
+        )
+
 
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we cannot connect."""
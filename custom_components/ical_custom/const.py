@@ -6,6 +6,7 @@ DOMAIN = "ical_custom"
 CONF_MAX_EVENTS = "max_events"
 CONF_DAYS = "days"
 CONF_FILTER_KEYWORD = "filter_keyword"  # Nouvelle constante pour le filtre sur le sommaire
+CONF_VERIFY_WINDOW = "verify_window"
 
 ICON = "mdi:calendar"
 DEFAULT_NAME = "iCal Sensor filter custom"
@@ -0,0 +1,27 @@
+"""Diagnostics support for ical_custom."""
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME, CONF_URL
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_URL}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry):
+    """Return diagnostics for a config entry."""
+    diagnostics = {"entry": async_redact_data(entry.data, TO_REDACT)}
+    # The calendar is missing when the entry failed to set up or is unloaded
+    ical_events = hass.data.get(DOMAIN, {}).get(entry.data.get(CONF_NAME))
+    if ical_events is not None:
+        diagnostics.update(
+            {
+                "events": len(ical_events.calendar),
+                # Seconds spent setting up the entry, loading the parser, fetching and parsing
+                "startup_timings": ical_events.startup_timings,
+                "refresh_timings": ical_events.refresh_timings,
+            }
+        )
+    return diagnostics
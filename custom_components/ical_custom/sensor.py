@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 import logging
 
 from homeassistant.const import CONF_NAME
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import Entity, generate_entity_id
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
@@ -30,11 +30,8 @@ async def async_setup_entry(
     filter_keyword = config.get(CONF_FILTER_KEYWORD, "")
 
     # Récupération de l'objet ical_events qui a été stocké dans hass.data
+    # The first refresh runs in the background and fills the sensors when it's done
     ical_events = hass.data[DOMAIN][name]
-    await ical_events.update()
-    if ical_events.calendar is None:
-        _LOGGER.error("Unable to fetch iCal")
-        return False
 
     sensors = []
     sensor_name = f"{DOMAIN} {name}"
@@ -51,10 +48,37 @@ async def async_setup_entry(
 
     async_add_entities(sensors)
 
+    @callback
+    def _async_write_changed_sensors():
+        """Write the state of the sensors whose event changed, in a single batch."""
+        event_list = _filter_events(ical_events.calendar, filter_keyword)
+        for sensor in sensors:
+            if sensor.async_update_from_events(event_list) and sensor.hass is not None:
+                sensor.async_write_ha_state()
+
+    config_entry.async_on_unload(
+        ical_events.async_add_listener(_async_write_changed_sensors)
+    )
+
+
+def _filter_events(event_list, filter_keyword):
+    """Return the events whose summary contains the filter keyword."""
+    # Appliquer le filtre par mot clé sur le sommaire si défini
+    filter_keyword = filter_keyword.lower() if filter_keyword else ""
+    if not filter_keyword:
+        return event_list
+    return [
+        event
+        for event in event_list
+        if filter_keyword in event.get("summary", "").lower()
+    ]
+
 
 class ICalSensor(Entity):
     """Representation of an iCal sensor that shows the Nth upcoming event matching a keyword filter."""
 
+    _attr_should_poll = False
+
     def __init__(self, hass: HomeAssistant, ical_events, sensor_name, event_number, filter_keyword) -> None:
         """Initialize the sensor.
 
@@ -83,6 +107,7 @@ class ICalSensor(Entity):
         }
         self._state = None
         self._is_available = None
+        self._fingerprint = None
 
     @property
     def unique_id(self) -> str:
@@ -120,19 +145,25 @@ class ICalSensor(Entity):
 
         await self.ical_events.update()
 
-        event_list = self.ical_events.calendar
-
-        # Appliquer le filtre par mot clé sur le sommaire si défini
-        if self._filter_keyword:
-            filtered_events = []
-            for event in event_list:
-                summary = event.get("summary", "").lower()
-                if self._filter_keyword in summary:
-                    filtered_events.append(event)
-            event_list = filtered_events
+        self.async_update_from_events(
+            _filter_events(self.ical_events.calendar, self._filter_keyword)
+        )
 
+    @callback
+    def async_update_from_events(self, event_list) -> bool:
+        """Update the sensor from the filtered events, return True if its state changed."""
         if event_list and (self._event_number < len(event_list)):
             val = event_list[self._event_number]
+        else:
+            val = None
+
+        # Cheap fingerprint of the slot, so unchanged sensors skip formatting and state writes
+        fingerprint = self._fingerprint_event(val)
+        if fingerprint == self._fingerprint:
+            return False
+        self._fingerprint = fingerprint
+
+        if val is not None:
             event_summary = val.get("summary", "Unknown")
             start = val.get("start")
 
@@ -144,19 +175,19 @@ class ICalSensor(Entity):
                 str(self._event_number),
             )
 
-            self._event_attributes["summary"] = event_summary
-            self._event_attributes["start"] = start.strftime('%Y%m%dT%H%M%S')
-            self._event_attributes["end"] = val.get("end").strftime('%Y%m%dT%H%M%S') if val.get("end") else None
-            self._event_attributes["location"] = val.get("location", "")
-            self._event_attributes["description"] = val.get("description", "")
-            self._event_attributes["all_day"] = val.get("all_day")
-            # Calcul de l'ETA en jours (ajusté d'un jour)
-            self._event_attributes["eta"] = (
-                start - datetime.now(start.tzinfo) + timedelta(days=1)
-            ).days
-
-            self._state = f"{event_summary} - {start.strftime('%-d %B %Y')}" 
-            if not val.get("all_day"): 
+            self._event_attributes = {
+                "summary": event_summary,
+                "description": val.get("description", ""),
+                "location": val.get("location", ""),
+                "start": start.strftime('%Y%m%dT%H%M%S'),
+                "end": val.get("end").strftime('%Y%m%dT%H%M%S') if val.get("end") else None,
+                # Calcul de l'ETA en jours (ajusté d'un jour)
+                "eta": fingerprint[-1],
+                "all_day": val.get("all_day"),
+            }
+
+            self._state = f"{event_summary} - {start.strftime('%-d %B %Y')}"
+            if not val.get("all_day"):
                 self._state += f" {start.strftime('%H:%M')}"
 
         else:
@@ -171,3 +202,21 @@ class ICalSensor(Entity):
             }
             self._state = None
             self._is_available = None
+
+        return True
+
+    @staticmethod
+    def _fingerprint_event(val):
+        """Return a tuple identifying everything the sensor shows for an event."""
+        if val is None:
+            return None
+        start = val.get("start")
+        return (
+            val.get("summary", "Unknown"),
+            start,
+            val.get("end"),
+            val.get("location", ""),
+            val.get("description", ""),
+            val.get("all_day"),
+            (start - datetime.now(start.tzinfo) + timedelta(days=1)).days,
+        )
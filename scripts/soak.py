@@ -0,0 +1,443 @@
+"""Soak test ical_custom with many calendars against a local feed server.
+
+Sets up a number of ical_custom config entries in a test Home Assistant instance,
+all pointing to a local stand-in ICS server, and runs them for a simulated
+period while measuring the event loop lag.
+
+Needs Home Assistant, pytest-homeassistant-custom-component and freezegun
+installed:
+
+    python scripts/soak.py --entries 200 --max-events 5 --hours 24
+
+The feed server runs in its own process, so its work doesn't show up in the
+reported loop lag, CPU time and memory. Every cycle moves the clock forward by
+one MIN_TIME_BETWEEN_UPDATES interval and fires the refresh timers of the
+entries, so longer runs cross midnight like a real installation would.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import random
+import sys
+import time
+from unittest.mock import patch
+
+from aiohttp import web
+from freezegun import freeze_time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from homeassistant import loader  # noqa: E402
+from homeassistant.const import (  # noqa: E402
+    CONF_NAME,
+    CONF_URL,
+    CONF_VERIFY_SSL,
+    EVENT_STATE_CHANGED,
+)
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    MockConfigEntry,
+    async_fire_time_changed,
+    async_test_home_assistant,
+)
+
+from custom_components.ical_custom import (  # noqa: E402
+    MIN_TIME_BETWEEN_UPDATES,
+    ICalEvents,
+)
+from custom_components.ical_custom.const import (  # noqa: E402
+    CONF_DAYS,
+    CONF_FILTER_KEYWORD,
+    CONF_MAX_EVENTS,
+    CONF_VERIFY_WINDOW,
+    DOMAIN,
+)
+
+LOOP_LAG_INTERVAL = 0.05
+NOT_MODIFIED_MODES = ("never", "conditional")
+
+
+def build_feed(name, size, recurring_ratio, revision, base):
+    """Return an ICS feed with size events, the first of them recurring weekly."""
+    stamp = base.strftime("%Y%m%dT%H%M%SZ")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:-//ical_custom soak//{name}//EN"]
+    recurring = int(size * recurring_ratio)
+    for number in range(size):
+        start = base + timedelta(hours=7 * number + revision)
+        end = start + timedelta(hours=1)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{name}-{number}@soak",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{start.strftime('%Y%m%dT%H%M%SZ')}",
+            f"DTEND:{end.strftime('%Y%m%dT%H%M%SZ')}",
+            f"SUMMARY:{name} event {number}",
+            f"LOCATION:Room {number % 10}",
+        ]
+        if number < recurring:
+            lines.append("RRULE:FREQ=WEEKLY;COUNT=52")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+class FeedServer:
+    """Stand-in ICS server with configurable latency, 304 behavior and feed sizes.
+
+    With not_modified "conditional" it answers 304 to a matching If-None-Match.
+    """
+
+    def __init__(self, entries, sizes, recurring_ratio, latency, jitter, not_modified):
+        """Set up the server, the feed of entry N has sizes[N % len(sizes)] events."""
+        self.entries = entries
+        self.sizes = sizes
+        self.recurring_ratio = recurring_ratio
+        self.latency = latency
+        self.jitter = jitter
+        self.not_modified = not_modified
+        self.revision = 0
+        self.responses = {200: 0, 304: 0}
+        self._base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self._feeds = {}
+        self._runner = None
+        self.url = None
+
+    def build_feeds(self, revision):
+        """Return the feeds of all entries for a revision."""
+        return {
+            number: build_feed(
+                f"soak{number}",
+                self.sizes[number % len(self.sizes)],
+                self.recurring_ratio,
+                revision,
+                self._base,
+            )
+            for number in range(self.entries)
+        }
+
+    def set_feeds(self, revision, feeds):
+        """Serve the prebuilt feeds of a new revision."""
+        self._feeds = feeds
+        self.revision = revision
+
+    async def start(self):
+        """Build the first feeds and start listening on a free local port."""
+        loop = asyncio.get_running_loop()
+        self.set_feeds(0, await loop.run_in_executor(None, self.build_feeds, 0))
+        app = web.Application()
+        app.router.add_get("/feed/{number}.ics", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        """Stop the server."""
+        await self._runner.cleanup()
+
+    async def _handle(self, request):
+        """Serve a prebuilt feed, or 304 according to the not_modified mode."""
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        number = int(request.match_info["number"])
+        text = self._feeds.get(number)
+        if text is None:
+            raise web.HTTPNotFound
+        etag = f'"{number}-{self.revision}"'
+        if (
+            self.not_modified == "conditional"
+            and request.headers.get("If-None-Match") == etag
+        ):
+            self.responses[304] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+
+        self.responses[200] += 1
+        return web.Response(text=text, content_type="text/calendar", headers={"ETag": etag})
+
+
+def serve_feeds(conn, options):
+    """Run the feed server in this process until told to stop."""
+    asyncio.run(_async_serve_feeds(conn, options))
+
+
+async def _async_serve_feeds(conn, options):
+    """Serve the feeds and handle the commands of the soak test."""
+    server = FeedServer(**options)
+    await server.start()
+    conn.send(server.url)
+
+    loop = asyncio.get_running_loop()
+    while True:
+        command, value = await loop.run_in_executor(None, conn.recv)
+        if command != "revision":
+            break
+        # Build the next revision off the request path, then swap it in
+        feeds = await loop.run_in_executor(None, server.build_feeds, value)
+        server.set_feeds(value, feeds)
+        conn.send(None)
+
+    await server.stop()
+    conn.send(server.responses)
+
+
+class FeedServerProcess:
+    """Run the FeedServer in a separate process."""
+
+    def __init__(self, **options):
+        """Set up the process, options are passed to FeedServer."""
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=serve_feeds, args=(child_conn, options), daemon=True
+        )
+        self.url = None
+
+    async def start(self):
+        """Start the process and wait for the server to listen."""
+        self._process.start()
+        self.url = await asyncio.get_running_loop().run_in_executor(None, self._conn.recv)
+
+    def feed_url(self, number):
+        """Return the URL of the feed of entry number."""
+        return f"{self.url}/feed/{number}.ics"
+
+    async def set_revision(self, revision):
+        """Change all feeds to a new revision."""
+        await self._request("revision", revision)
+
+    async def stop(self):
+        """Stop the server and return the number of responses per status."""
+        responses = await self._request("stop")
+        self._process.join()
+        return responses
+
+    async def _request(self, command, value=None):
+        """Send a command to the server process and wait for the reply."""
+        self._conn.send((command, value))
+        return await asyncio.get_running_loop().run_in_executor(None, self._conn.recv)
+
+
+async def monitor_loop_lag(samples):
+    """Record how late the event loop wakes up from a short sleep."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        elapsed = loop.time() - start
+        # async_fire_time_changed runs this sleep early, that isn't lag
+        if elapsed >= LOOP_LAG_INTERVAL:
+            samples.append(elapsed - LOOP_LAG_INTERVAL)
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Return the nearest-rank percentiles and the maximum of samples, in ms."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {
+        f"p{point}": ordered[min(len(ordered) - 1, len(ordered) * point // 100)] * 1000
+        for point in points
+    }
+    result["max"] = ordered[-1] * 1000
+    return result
+
+
+def rss_mb():
+    """Return the current resident set size in MB, the peak without /proc, or None."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (2**20 if platform.system() == "Darwin" else 2**10), 1)
+
+
+async def run(args):
+    """Run the soak test and return the report."""
+    server = FeedServerProcess(
+        entries=args.entries,
+        sizes=[int(size) for size in args.feed_sizes.split(",")],
+        recurring_ratio=args.recurring_ratio,
+        latency=args.latency,
+        jitter=args.jitter,
+        not_modified=args.not_modified,
+    )
+    await server.start()
+
+    loop = asyncio.get_running_loop()
+    lag_samples = []
+    latencies = []
+    errors = []
+    state_writes = 0
+
+    # The timers of the entries are the only source of refreshes, this times them
+    async_refresh = ICalEvents.async_refresh
+
+    async def timed_refresh(ical_events, now=None):
+        start = loop.time()
+        refreshed = await async_refresh(ical_events, now)
+        if refreshed:
+            latencies.append(loop.time() - start)
+        else:
+            errors.append(ical_events.name)
+        return refreshed
+
+    # Home Assistant's clock is moved by hand, while asyncio keeps the real one
+    with (
+        freeze_time(datetime.now(timezone.utc), real_asyncio=True) as frozen,
+        patch.object(ICalEvents, "async_refresh", timed_refresh),
+    ):
+        async with async_test_home_assistant() as hass:
+            # Load the integration from this repository
+            hass.data.pop(loader.DATA_CUSTOM_COMPONENTS, None)
+
+            def count_state_write(event):
+                nonlocal state_writes
+                state_writes += 1
+
+            hass.bus.async_listen(EVENT_STATE_CHANGED, count_state_write)
+            monitor = asyncio.create_task(monitor_loop_lag(lag_samples))
+
+            entries = []
+            for number in range(args.entries):
+                entry = MockConfigEntry(
+                    domain=DOMAIN,
+                    title=f"soak{number}",
+                    data={
+                        CONF_NAME: f"soak{number}",
+                        CONF_URL: server.feed_url(number),
+                        CONF_MAX_EVENTS: args.max_events,
+                        CONF_DAYS: args.days,
+                        CONF_VERIFY_SSL: False,
+                        CONF_FILTER_KEYWORD: args.filter_keyword,
+                    },
+                    options={CONF_VERIFY_WINDOW: args.verify_window},
+                )
+                entry.add_to_hass(hass)
+                entries.append(entry)
+
+            # Setup includes the first refreshes, also when they run as background tasks
+            cpu_start = time.process_time()
+            setup_start = loop.time()
+            await asyncio.gather(
+                *(hass.config_entries.async_setup(entry.entry_id) for entry in entries)
+            )
+            await hass.async_block_till_done(wait_background_tasks=True)
+            setup_seconds = loop.time() - setup_start
+            setup_report = {
+                "seconds": round(setup_seconds, 3),
+                "loop_lag_ms": percentiles(lag_samples),
+                "refresh_latency_ms": percentiles(latencies),
+                "refresh_errors": len(errors),
+                "state_writes": state_writes,
+                "rss_mb": rss_mb(),
+            }
+            lag_samples.clear()
+            latencies.clear()
+            errors.clear()
+            state_writes = 0
+
+            cycles = int(timedelta(hours=args.hours) / MIN_TIME_BETWEEN_UPDATES)
+            run_start = loop.time()
+            for cycle in range(1, cycles + 1):
+                cycle_start = loop.time()
+                if args.change_every and cycle % args.change_every == 0:
+                    await server.set_revision(cycle // args.change_every)
+                frozen.tick(MIN_TIME_BETWEEN_UPDATES)
+                # The timers are scheduled on the real loop clock, at most one interval ahead
+                async_fire_time_changed(
+                    hass, datetime.now(timezone.utc) + MIN_TIME_BETWEEN_UPDATES
+                )
+                await hass.async_block_till_done()
+                await asyncio.sleep(max(0, args.cycle_seconds - (loop.time() - cycle_start)))
+            run_seconds = loop.time() - run_start
+
+            monitor.cancel()
+            cpu_seconds = time.process_time() - cpu_start
+            sensors = len(hass.states.async_entity_ids("sensor"))
+            simulated_end = datetime.now(timezone.utc)
+
+    responses = await server.stop()
+
+    return {
+        "entries": args.entries,
+        "sensors": sensors,
+        "cycles": cycles,
+        "simulated_hours": args.hours,
+        "simulated_end": simulated_end.isoformat(),
+        "setup": setup_report,
+        "run_seconds": round(run_seconds, 3),
+        "loop_lag_ms": percentiles(lag_samples),
+        "refresh_latency_ms": percentiles(latencies),
+        "refresh_errors": len(errors),
+        "state_writes": state_writes,
+        "feed_responses": responses,
+        "cpu_seconds": round(cpu_seconds, 3),
+        "rss_mb": rss_mb(),
+    }
+
+
+def main():
+    """Parse the arguments, run the soak test and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100, help="number of calendars")
+    parser.add_argument("--max-events", type=int, default=5, help="sensors per calendar")
+    parser.add_argument("--days", type=int, default=365, help="days to fetch events for")
+    parser.add_argument("--filter-keyword", default="", help="filter keyword of every calendar")
+    parser.add_argument(
+        "--verify-window", action="store_true", help="check every sliding window against a rebuild"
+    )
+    parser.add_argument("--hours", type=float, default=1, help="simulated period")
+    parser.add_argument(
+        "--cycle-seconds", type=float, default=1, help="minimum real seconds per update interval"
+    )
+    parser.add_argument(
+        "--feed-sizes", default="50,500", help="comma separated events per feed, cycled over the entries"
+    )
+    parser.add_argument(
+        "--recurring-ratio", type=float, default=0.2, help="share of recurring events in a feed"
+    )
+    parser.add_argument("--latency", type=float, default=0.05, help="server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="random extra latency in seconds")
+    parser.add_argument(
+        "--not-modified",
+        choices=NOT_MODIFIED_MODES,
+        default="never",
+        help="when to answer 304: never, or to a matching If-None-Match",
+    )
+    parser.add_argument(
+        "--change-every", type=int, default=0, help="change the feeds every N cycles, 0 never"
+    )
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    parser.add_argument(
+        "--fail-lag-p99", type=float, help="exit with an error above this p99 loop lag in ms"
+    )
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.fail_lag_p99 is not None and report["loop_lag_ms"].get("p99", 0) > args.fail_lag_p99:
+        sys.exit(f"p99 loop lag above {args.fail_lag_p99} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Tests for the ical_custom integration."""
@@ -0,0 +1,117 @@
+"""Test that sliding the window of expanded events matches a full rebuild.
+
+Needs pytest-homeassistant-custom-component.
+"""
+
+from datetime import date, timedelta
+
+import icalendar
+import pytest
+
+from homeassistant.const import CONF_NAME, CONF_URL, CONF_VERIFY_SSL
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.ical_custom import ICalEvents, async_get_parser
+from custom_components.ical_custom.const import CONF_DAYS, CONF_MAX_EVENTS
+
+CONFIG = {
+    CONF_NAME: "test",
+    CONF_URL: "http://localhost/test.ics",
+    CONF_MAX_EVENTS: 5,
+    CONF_DAYS: 14,
+    CONF_VERIFY_SSL: True,
+}
+
+# Crosses the US daylight saving change of 2025-03-09
+FIRST_DAY = date(2025, 3, 1)
+
+FEED = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//ical_custom//test//EN
+BEGIN:VEVENT
+UID:until@test
+DTSTAMP:20250101T000000Z
+DTSTART:20250303T090000Z
+DTEND:20250303T100000Z
+RRULE:FREQ=WEEKLY;UNTIL=20250331T090000Z
+SUMMARY:Weekly until
+END:VEVENT
+BEGIN:VEVENT
+UID:count@test
+DTSTAMP:20250101T000000Z
+DTSTART:20250301T180000Z
+DTEND:20250301T190000Z
+RRULE:FREQ=DAILY;COUNT=20
+EXDATE:20250305T180000Z,20250310T180000Z
+SUMMARY:Daily count with exdates
+LOCATION:Office
+END:VEVENT
+BEGIN:VEVENT
+UID:allday-recurring@test
+DTSTAMP:20250101T000000Z
+DTSTART;VALUE=DATE:20250302
+RRULE:FREQ=WEEKLY;COUNT=6
+SUMMARY:Weekly all day without end
+END:VEVENT
+BEGIN:VEVENT
+UID:noend@test
+DTSTAMP:20250101T000000Z
+DTSTART:20250306T120000Z
+SUMMARY:Without end
+END:VEVENT
+BEGIN:VEVENT
+UID:allday@test
+DTSTAMP:20250101T000000Z
+DTSTART;VALUE=DATE:20250308
+DTEND;VALUE=DATE:20250309
+SUMMARY:All day
+DESCRIPTION:A whole day
+END:VEVENT
+BEGIN:VEVENT
+UID:later@test
+DTSTAMP:20250101T000000Z
+DTSTART:20250325T080000Z
+DTEND:20250325T083000Z
+SUMMARY:Later
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def _window(day):
+    """Return the window update uses on the given day after FIRST_DAY."""
+    from_date = dt_util.start_of_local_day(FIRST_DAY + timedelta(days=day))
+    return from_date, from_date + timedelta(days=CONFIG[CONF_DAYS])
+
+
+async def _ical_events(hass: HomeAssistant):
+    """Return a calendar with its parser loaded."""
+    ical_events = ICalEvents(hass=hass, config=CONFIG)
+    ical_events._parser = await async_get_parser(hass)
+    return ical_events
+
+
+async def _rebuild(hass: HomeAssistant, from_date, to_date):
+    """Return the events of a full parse of the feed."""
+    ical_events = await _ical_events(hass)
+    return await ical_events._ical_parser(
+        icalendar.Calendar.from_ical(FEED), from_date, to_date
+    )
+
+
+@pytest.mark.parametrize("step", [1, 3])
+async def test_sliding_window_matches_rebuild(hass: HomeAssistant, step) -> None:
+    """Test sliding over several midnights gives the same events as a rebuild."""
+    ical_events = await _ical_events(hass)
+    from_date, to_date = _window(0)
+    first = await ical_events._ical_parser(
+        icalendar.Calendar.from_ical(FEED), from_date, to_date
+    )
+    assert any(event["all_day"] for event in first)
+
+    for day in range(step, 35, step):
+        from_date, to_date = _window(day)
+        slid = ical_events._ical_slide_window(from_date, to_date)
+        assert slid is not None
+        assert slid == await _rebuild(hass, from_date, to_date)